@@ -42,7 +42,7 @@ Module Structure:
 
     handle_commands(args, phonebook): Handles the specified command based on the provided arguments.
 
-    get_options(): Defines the command-line arguments and options.
+    get_options(argv): Defines the command-line arguments and options, and parses them.
 
     main(): Entry point of the API. Parses command-line arguments, creates a Phonebook instance,
         and executes the requested command.
@@ -51,9 +51,8 @@ Module Structure:
 
 
 import os
-import argparse
-from datetime import datetime
-import webbrowser
+import sys
+from types import SimpleNamespace
 
 from lib.person import Person
 from lib.phonebook import Phonebook
@@ -62,6 +61,62 @@ from config.baseconfig import EXPORTS_DIR
 from config.baseconfig import styling as style
 
 
+# Building blocks of the HTML export of the phonebook
+_HTML_HEADER = "<html>\n<head>\n<title>Contact Information</title>\n</head>\n<body>\n"
+_HTML_CONTACT = ("<div>\n"
+                 "<h2>{full_name}</h2>\n"
+                 "<p>First Name: {first_name}</p>\n"
+                 "<p>Last Name: {last_name}</p>\n"
+                 "<p>Phone: {phone}</p>\n"
+                 "<p>Address: {address}</p>\n"
+                 "</div>\n")
+_HTML_FOOTER = "</body>\n</html>"
+
+# Styled prompts and messages of the interactive commands, formatted once
+_PROMPT_CHOICE = f"\n{style['CYAN']}Which item number would you like to proceed with: {style['END']}"
+_PROMPT_CONFIRM = (f"\n{style['ORANGE']}Are you sure you want to proceed with this contact? "
+                   f"(yes/no):{style['END']} ")
+_MSG_INVALID_ENTRY = f"{style['PURPLE']}Not a valid entry!{style['END']}"
+
+_PROMPT_FIRST_NAME = f"{style['CYAN']}Enter the First name: {style['END']}"
+_PROMPT_LAST_NAME = f"{style['CYAN']}Enter the Last name: {style['END']}"
+_PROMPT_PHONE = f"{style['CYAN']}Enter the Phone number: {style['END']}"
+_PROMPT_ADDRESS = f"{style['CYAN']}Enter the Address: {style['END']}"
+_MSG_ADD_REQUIRED = (f"{style['ORANGE']}Either a First or Last name along with at least a phone "
+                     f"number or an address is required. Please try again!{style['END']}")
+
+_MSG_NAME_REQUIRED = f"\n{style['GREEN1']}At least one of First or Last name is required!{style['END']}"
+_PROMPT_UPDATED_FIRST_NAME = f"{style['YELLOW']}Enter the updated First name: {style['END']}"
+_PROMPT_UPDATED_LAST_NAME = f"{style['YELLOW']}Enter the updated Last name: {style['END']}"
+_MSG_CONTACT_REQUIRED = f"\n{style['PURPLE']}At least one of Phone or Address is required! {style['END']}"
+_PROMPT_UPDATED_PHONE = f"{style['CYAN']}Enter the updated phone number: {style['END']}"
+_PROMPT_UPDATED_ADDRESS = f"{style['CYAN']}Enter the updated address: {style['END']}"
+
+# The value of every command-line option when it is not given
+_DEFAULT_OPTIONS = {
+    'first_name': None, 'last_name': None, 'phone': None, 'address': None,
+    'search': None, 'add': False, 'remove': None, 'update': None,
+    'display_all_contacts': False, 'export_json': False, 'export_yaml': False,
+    'export_html': False,
+}
+
+# Actions that take no value, and actions followed by one or more words, mapped to
+# the option they set. A command line made of just one of them is parsed without argparse
+_FLAG_ACTIONS = {
+    '-a': 'add', '--add': 'add',
+    '-d': 'display_all_contacts', '--display_all_contacts': 'display_all_contacts',
+    '--export_json': 'export_json', '--export_yaml': 'export_yaml',
+    '--export_html': 'export_html',
+}
+_WORDS_ACTIONS = {
+    '-s': 'search', '--search': 'search',
+    '-r': 'remove', '--remove': 'remove',
+    '-u': 'update', '--update': 'update',
+}
+
+# Escapes the characters with a special meaning in HTML in a single pass of str.translate
+_HTML_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;',
+                               '"': '&quot;', "'": '&#39;'})
 
 
 def get_target_contact(name_info, phonebook):
@@ -101,8 +156,7 @@ def get_target_contact(name_info, phonebook):
             # Display information for each contact along with item numbers
             phonebook.display_contact_info(contact, item_number=i)
         while True:
-            choice = input(f"\n{style['CYAN']}Which item number would you like "
-                           f"to proceed with: {style['END']}")
+            choice = input(_PROMPT_CHOICE)
             try:
                 choice = int(choice)
                 if 1 <= choice <= len(contacts):
@@ -115,13 +169,11 @@ def get_target_contact(name_info, phonebook):
         contact = contacts[choice - 1]
 
     # Ask for confirmation
-    confirmation = input(f"\n{style['ORANGE']}Are you sure you want to proceed with "
-                         f"this contact? (yes/no):{style['END']} ")
+    confirmation = input(_PROMPT_CONFIRM)
 
     while confirmation.lower() not in ['yes', 'y', 'no', 'n']:
-        print(f"{style['PURPLE']}Not a valid entry!{style['END']}")
-        confirmation = input(f"\n{style['ORANGE']}Are you sure you want to proceed "
-                             f"with this contact? (yes/no):{style['END']} ")
+        print(_MSG_INVALID_ENTRY)
+        confirmation = input(_PROMPT_CONFIRM)
 
     if confirmation.lower() not in ['yes', 'y']:
         print("Canceled.")
@@ -149,23 +201,22 @@ def add_contact(args, phonebook):
         # Prompt for missing first name and last name if not provided through command-line arguments
         if not args.first_name and not args.last_name:
             if not args.first_name:
-                args.first_name = input(f"{style['CYAN']}Enter the First name: {style['END']}")
+                args.first_name = input(_PROMPT_FIRST_NAME)
             if not args.last_name:
-                args.last_name = input(f"{style['CYAN']}Enter the Last name: {style['END']}")
+                args.last_name = input(_PROMPT_LAST_NAME)
         
         # Prompt for missing phone number and address if not provided through command-line arguments
         if not args.phone and not args.address:
             if not args.phone:
-                args.phone = input(f"{style['CYAN']}Enter the Phone number: {style['END']}")
+                args.phone = input(_PROMPT_PHONE)
             if not args.address:
-                args.address = input(f"{style['CYAN']}Enter the Address: {style['END']}")
+                args.address = input(_PROMPT_ADDRESS)
 
         # Check if any of the required fields are empty
         if (args.first_name or args.last_name) and (args.phone or args.address):
             break
 
-        print(f"{style['ORANGE']}Either a First or Last name along with at least a phone number or an address "
-              "is required. Please try again!{style['END']}")
+        print(_MSG_ADD_REQUIRED)
 
     # Create a new Person object with the provided information
     person = Person(args.first_name or "", 
@@ -226,21 +277,17 @@ def update_contact(args, phonebook):
     # Prompt for missing information if not provided through command-line arguments
     if not args.first_name and not args.last_name:
         while not args.first_name and not args.last_name:
-            print(f"\n{style['GREEN1']}At least one of First or Last name is "
-                  f"required!{style['END']}")
-            
-            args.first_name = input(f"{style['YELLOW']}Enter the updated "
-                                    f"First name: {style['END']}")
-            args.last_name = input(f"{style['YELLOW']}Enter the updated "
-                                   f"Last name: {style['END']}")
+            print(_MSG_NAME_REQUIRED)
+
+            args.first_name = input(_PROMPT_UPDATED_FIRST_NAME)
+            args.last_name = input(_PROMPT_UPDATED_LAST_NAME)
 
     if not args.phone and not args.address:
         while not args.phone and not args.address:
-            print(f"\n{style['PURPLE']}At least one of Phone or Address is "
-                  f"required! {style['END']}")
-            
-            args.phone = input(f"{style['CYAN']}Enter the updated phone number: {style['END']}")
-            args.address = input(f"{style['CYAN']}Enter the updated address: {style['END']}")
+            print(_MSG_CONTACT_REQUIRED)
+
+            args.phone = input(_PROMPT_UPDATED_PHONE)
+            args.address = input(_PROMPT_UPDATED_ADDRESS)
 
     # Update the selected contact with the provided information
     contact.first_name = args.first_name or ""
@@ -284,6 +331,18 @@ def search_contacts(args, phonebook):
     return search_results
 
 
+def _now():
+    """
+    Return the current date and time, which timestamps the exported files.
+
+    Returns:
+        datetime: The current local date and time.
+    """
+    from datetime import datetime
+
+    return datetime.now()
+
+
 def export_phonebook(phonebook, export_format):
     """
     Export the phonebook instance to a JSON or YAML file.
@@ -304,7 +363,7 @@ def export_phonebook(phonebook, export_format):
     os.makedirs(EXPORTS_DIR, exist_ok=True)
 
     # Construct the export file path based on the current date and time
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    timestamp = _now().strftime('%Y-%m-%d_%H-%M-%S')
     export_filename = f'phonebook-export-{timestamp}.{export_format}'
     export_path = os.path.join(EXPORTS_DIR, export_filename)
 
@@ -327,6 +386,29 @@ def print_all_contacts(phonebook):
     """
     phonebook.display_all_contacts()
 
+def iter_contacts_html(phonebook):
+    """
+    Generate the HTML representation of all contacts' information in the phonebook,
+    one contact at a time. The contacts' information is HTML-escaped.
+
+    Args:
+        phonebook (Phonebook): The Phonebook instance containing the contacts.
+
+    Yields:
+        str: The consecutive pieces of the HTML document.
+    """
+    yield _HTML_HEADER
+
+    for contact in phonebook.contacts:
+        yield _HTML_CONTACT.format(full_name=str(contact.full_name).translate(_HTML_ESCAPES),
+                                   first_name=str(contact.first_name).translate(_HTML_ESCAPES),
+                                   last_name=str(contact.last_name).translate(_HTML_ESCAPES),
+                                   phone=str(contact.phone).translate(_HTML_ESCAPES),
+                                   address=str(contact.address).translate(_HTML_ESCAPES))
+
+    yield _HTML_FOOTER
+
+
 def generate_contacts_html(phonebook):
     """
     Generate an HTML representation of all contacts' information in the phonebook.
@@ -337,39 +419,32 @@ def generate_contacts_html(phonebook):
     Returns:
         str: HTML representation of all contacts' information.
     """
-    html = "<html>\n<head>\n<title>Contact Information</title>\n</head>\n<body>\n"
-    
-    for contact in phonebook.contacts:
-        html += "<div>\n"
-        html += f"<h2>{contact.full_name}</h2>\n"
-        html += f"<p>First Name: {contact.first_name}</p>\n"
-        html += f"<p>Last Name: {contact.last_name}</p>\n"
-        html += f"<p>Phone: {contact.phone}</p>\n"
-        html += f"<p>Address: {contact.address}</p>\n"
-        html += "</div>\n"
-    
-    html += "</body>\n</html>"
-    return html
+    return ''.join(iter_contacts_html(phonebook))
 
 
-def export_and_open_html(html_content):
+def export_and_open_html(phonebook):
 
     """
-    Save HTML content to a file and open it in the system's default web browser.
+    Save the HTML representation of the phonebook to a file and open it in the
+    system's default web browser.
+
+    The HTML is written to the file one contact at a time, so the whole document
+    is never held in memory.
 
     Args:
-        html_content (str): The HTML content to be saved.
-        filename (str): The name of the file to save the HTML content to.
+        phonebook (Phonebook): The Phonebook instance containing the contacts.
 
     Returns:
         None
     """
+    import webbrowser
+
     # construct the filename
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    timestamp = _now().strftime('%Y-%m-%d_%H-%M-%S')
     export_path = os.path.join(EXPORTS_DIR, f'phonebook_html_{timestamp}.html')
     # Save the HTML content to a file
     with open(export_path, 'w') as html_file:
-        html_file.write(html_content)
+        html_file.writelines(iter_contacts_html(phonebook))
 
     # Open the HTML file in the system's default web browser
     webbrowser.open(export_path)
@@ -393,19 +468,67 @@ def handle_commands(args, phonebook):
     elif args.display_all_contacts:
         print_all_contacts(phonebook)
     elif args.export_html:
-        html = generate_contacts_html(phonebook)
-        export_and_open_html(html)
+        export_and_open_html(phonebook)
     else:
         print("No valid command specified.")
 
 
-def get_options():
+def parse_simple_options(argv):
+    """
+    Parse a command line made of a single action without building the argparse parser.
+
+    This covers the common invocations, such as `-s John Doe` or `-d`, and keeps
+    argparse off the startup path for them.
+
+    Args:
+        argv (list): The command-line arguments, without the program name.
+
+    Returns:
+        SimpleNamespace: The parsed command-line arguments, or None if the command
+                         line needs the full parser.
+    """
+    if not argv:
+        return None
+
+    action, words = argv[0], argv[1:]
+    if any(word.startswith('-') for word in words):
+        return None
+
+    options = dict(_DEFAULT_OPTIONS)
+    if action in _FLAG_ACTIONS and not words:
+        options[_FLAG_ACTIONS[action]] = True
+    elif action in _WORDS_ACTIONS and words:
+        options[_WORDS_ACTIONS[action]] = words
+    else:
+        return None
+
+    return SimpleNamespace(**options)
+
+
+def get_options(argv=None):
     """
     Define the command-line arguments and options using argparse.
 
+    Command lines made of a single action are parsed by `parse_simple_options()`
+    instead, and only the others build the full parser.
+
+    Args:
+        argv (list, optional): The command-line arguments, without the program name.
+                               Defaults to sys.argv[1:].
+
     Returns:
         argparse.Namespace: The parsed command-line arguments.
     """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_simple_options(argv)
+    if args is not None:
+        return args
+
+    # Imported here since most invocations never need it
+    import argparse
+
     # Define the usage examples for the epilog
     epilog = f"""
     
@@ -470,7 +593,7 @@ def get_options():
                             required=False)
     
     # Parse the command-line arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     return args
 
@@ -487,7 +610,8 @@ def get_options():
 def main():
     """
     Entry point of the API. Parses command-line arguments, creates a Phonebook instance,
-    and executes the requested command.
+    and executes the requested command. The database is only saved if the command
+    changed the phonebook.
 
     Returns:
         None
@@ -501,8 +625,9 @@ def main():
     # Handle the specified command
     handle_commands(args, phonebook)
 
-    # Save the phonebook to the database
-    phonebook.save_to_file(JSON_DATABASE_FILE, file_format='json')
+    # Save the phonebook to the database, unless the command only read it
+    if phonebook.dirty:
+        phonebook.save_to_file(JSON_DATABASE_FILE, file_format='json')
 
 
 
@@ -512,7 +637,6 @@ if __name__ == '__main__':
         main()
     except KeyboardInterrupt:
         print('\nKeyboard Interrupt!')
-        import sys
         try:
             sys.exit(0)
         except SystemExit:
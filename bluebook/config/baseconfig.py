@@ -12,6 +12,8 @@ Configuration Constants:
     API_DIR (str): The directory path for the package's code.
     EXPORTS_DIR (str): The directory path for the exports.
     TEST_UNIT_DIR (str): The directory path for the test units.
+    SEARCH_PHONE (bool): Whether phone number queries are matched against the phone numbers.
+    SEARCH_ADDRESS (bool): Whether search queries are matched against the addresses.
 
 Styling Dictionary:
     styling (dict): A dictionary containing different color codes for styling text output.
@@ -45,6 +47,11 @@ API_DIR = os.path.join(BASE_PATH, 'api/')
 EXPORTS_DIR = os.path.join(BASE_PATH, 'exports/')
 TEST_UNIT_DIR = os.path.join(BASE_PATH, 'test/')
 
+#Declaring the fields searched besides the names. Disable the ones your phonebook
+#doesn't store, so searches don't spend time on them
+SEARCH_PHONE = True
+SEARCH_ADDRESS = True
+
 
 
 # slyling is used to colorize different parts of texts which get printed on the screen
@@ -30,8 +30,15 @@ class Person:
     """
     This class inherits from the object class and represents a Person object
     with first and last names, phone number, and address attributes.
+
+    The full name and the lowercased names and address are cached whenever a name or
+    the address is set, so they are never rebuilt on read and never go stale.
     """
 
+    __slots__ = ('_first_name', '_last_name', '_phone', '_address', '_full_name',
+                 '_lower_first', '_lower_last', '_lower_full', '_lower_address',
+                 '_search_blob')
+
     def __init__(self, first_name: str, last_name: str, phone=None, address=None):
         """
         Initialize a new Person object.
@@ -43,12 +50,92 @@ class Person:
             address (str, optional): The address of the person. Defaults to None.
         """
 
-        self.first_name = first_name
-        self.last_name = last_name
-        self.phone = phone
-        self.address = address
-        self.full_name = '{} {}'.format(self.first_name, self.last_name)
-    
+        self._first_name = first_name
+        self._last_name = last_name
+        self._phone = phone
+        self._address = address
+        self._update_caches()
+
+    def _update_caches(self):
+        """
+        Recompute the full name, the lowercased fields and the name and address text that
+        searches are matched against. Phone numbers are searched through the phonebook's
+        phone index.
+
+        The fields of the search text are joined with a unit separator so a query can never
+        match across two different fields.
+        """
+        if self._last_name:
+            self._full_name = '{} {}'.format(self._first_name, self._last_name)
+        else:
+            # Without a last name the full name is just the first name
+            self._full_name = self._first_name or ''
+
+        self._lower_first = (self._first_name or '').lower()
+        self._lower_last = (self._last_name or '').lower()
+        self._lower_full = self._full_name.lower()
+        self._lower_address = (self._address or '').lower()
+        self._search_blob = self._lower_full + '\x1f' + self._lower_address
+
+    @property
+    def first_name(self):
+        """str: The first name of the person."""
+        return self._first_name
+
+    @first_name.setter
+    def first_name(self, value):
+        self._first_name = value
+        self._update_caches()
+
+    @property
+    def last_name(self):
+        """str: The last name of the person."""
+        return self._last_name
+
+    @last_name.setter
+    def last_name(self, value):
+        self._last_name = value
+        self._update_caches()
+
+    @property
+    def full_name(self):
+        """str: The first and last name of the person, separated by a space."""
+        return self._full_name
+
+    @property
+    def phone(self):
+        """str: The phone number of the person."""
+        return self._phone
+
+    @phone.setter
+    def phone(self, value):
+        self._phone = value
+
+    @property
+    def address(self):
+        """str: The address of the person."""
+        return self._address
+
+    @address.setter
+    def address(self, value):
+        self._address = value
+        self._update_caches()
+
+    def to_dict(self):
+        """
+        Get the person's public information as a dictionary.
+
+        Returns:
+            dict: The person's first name, last name, phone, address and full name.
+        """
+        return {
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "phone": self.phone,
+            "address": self.address,
+            "full_name": self.full_name,
+        }
+
     @classmethod
     def from_dict(cls, data):
         """
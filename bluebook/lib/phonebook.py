@@ -19,11 +19,22 @@ Usage:
     6. Save the phonebook data to a file using the `save_to_file()` method.
     7. Load phonebook data from a file using the `load_from_file()` method.
     8. Search for contacts using the `search_contacts()` method.
-    9. Display contact information using the `display_contact_info()` method.
+    9. Look up contacts by an exact name or phone number using the `search_exact()` method.
+    10. Display contact information using the `display_contact_info()` method.
 
 Dependencies:
+    - os: Required for writing the saved file durably and replacing it atomically.
+    - sys: Required for writing the contacts' information to the screen.
+    - functools: Required for caching the results of recent searches.
+    - re: Required for normalizing phone numbers in the search indexes.
+    - bisect: Required for prefix lookups of phone numbers and for locating search matches.
+    - itertools: Required for computing where each contact starts in the search text.
+    - operator: Required for getting the text of each contact that searches are matched against.
     - json: Required for serialization and deserialization in JSON format.
-    - yaml: Required for serialization and deserialization in YAML format.
+    - orjson (optional): A faster replacement for json, used when it is installed.
+    - yaml: Required for serialization and deserialization in YAML format. The libyaml
+            based loader and dumper are used when PyYAML was built with them. It is
+            only imported when a YAML file is saved or loaded.
     - typing: Required for type hints.
             "typing: Required for type hints," means that the typing module is necessary 
             to define and use type hints in the Phonebook module. It clarifies that if you
@@ -58,12 +69,110 @@ Example:
     pb.load_from_file('phonebook.json', 'json')
 """
 
+import os
+import re
+import sys
+import functools
 import json
-import yaml
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from operator import attrgetter
 from typing import List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from lib.person import Person
 from config.baseconfig import styling as style
+from config.baseconfig import SEARCH_PHONE
+from config.baseconfig import SEARCH_ADDRESS
+
+
+# Matches everything in a phone number that is not a digit
+_NON_DIGITS = re.compile(r'\D')
+
+# Characters ignored when deciding whether a search query is a phone number
+_PHONE_PUNCTUATION = str.maketrans('', '', ' -+().')
 
+# Separates the contacts' search texts in the text scanned by search_contacts(), and
+# the fields within a contact's search text
+_RECORD_SEPARATOR = '\x1e'
+_FIELD_SEPARATOR = '\x1f'
+
+# The layout of a contact's information on the screen, one right-aligned label per field
+_CONTACT_TEMPLATE = ''.join(
+    '  {: >15} : {{{}}}\n'.format(field.replace('_', ' '), field)
+    for field in ('first_name', 'last_name', 'phone', 'address', 'full_name'))
+
+# Fields supported by Phonebook.search_exact(), in the order of _index_keys()[1:]
+_EXACT_FIELDS = ('first_name', 'last_name', 'phone')
+
+
+def _dump_json(obj) -> bytes:
+    """
+    Serialize an object to JSON indented by two spaces, with orjson when it is installed.
+
+    Like orjson, the json fallback writes non-ASCII characters as UTF-8 rather than
+    escaping them, so the saved file does not depend on which one is used.
+
+    Args:
+        obj: The object to serialize.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+
+
+def _contact_search_text():
+    """
+    Get the function returning the text of a contact that searches are matched against.
+
+    Returns:
+        Callable[[Person], str]: A function returning the contact's lowercased full name,
+                                 followed by its lowercased address if SEARCH_ADDRESS is
+                                 enabled.
+    """
+    if SEARCH_ADDRESS:
+        return attrgetter('_search_blob')
+    return attrgetter('_lower_full')
+
+
+def _index_keys(person: Person) -> tuple:
+    """
+    Build the keys a person is filed under in the phonebook's indexes.
+
+    Args:
+        person (Person): The contact to build the keys for.
+
+    Returns:
+        tuple: The full name, lowercased first name, lowercased last name and
+               the digits of the phone. An empty field other than the full name
+               is None, and is not filed.
+    """
+    return (person.full_name,
+            person._lower_first or None,
+            person._lower_last or None,
+            _NON_DIGITS.sub('', person.phone or '') or None)
+
+
+def _unfile(index: dict, key, person: Person):
+    """
+    Remove a contact from the bucket it is filed under in an index.
+
+    Args:
+        index (dict): The index mapping keys to lists of contacts.
+        key: The key the contact is filed under.
+        person (Person): The contact to remove.
+    """
+    bucket = index[key]
+    bucket.remove(person)
+    if not bucket:
+        del index[key]
 
 
 class Phonebook:
@@ -77,38 +186,226 @@ class Phonebook:
         """
         self.contacts = []
 
+        # Whether the contacts have changed since the phonebook was created or loaded
+        self.dirty = False
+
+        # The indexes below are only needed to look contacts up or change them, so they
+        # are built on first use and dropped when a file is loaded. They are None until then
+
+        # Maps a full name to the contacts with it, in the order of the contacts list
+        self._by_full_name = None
+
+        # Inverted indexes mapping a lowercased first name, lowercased last name
+        # and phone digits to the contacts filed under them, in _EXACT_FIELDS order
+        self._exact_indexes = None
+
+        # The keys each contact was filed under, so it can be unfiled even after
+        # its attributes have been changed in place
+        self._filed_keys = None
+
+        # Sorted phone digits for prefix searches, rebuilt lazily after phones change
+        self._phone_keys = None
+
+        # The search texts of all contacts joined into one string, and the offset
+        # each contact starts at, rebuilt lazily after the contacts change
+        self._search_text = None
+        self._search_starts = None
+
+        # The last name or address query and its matches. While a query is being typed,
+        # each query extends the last one and can only match a subset of its matches
+        self._last_search = None
+
+        # Results of recent searches by lowercased query, cleared whenever the contacts change
+        self._cached_search = functools.lru_cache(maxsize=128)(self._search)
+
+    def _build_search_text(self):
+        """
+        Join the search texts of all contacts into one string for search_contacts().
+
+        The offsets the contacts start at are followed by the offset a contact added
+        next would start at, so every contact has a next offset to resume a search at.
+        """
+        blobs = list(map(_contact_search_text(), self.contacts))
+        self._search_text = _RECORD_SEPARATOR.join(blobs)
+        self._search_starts = list(accumulate([len(blob) + 1 for blob in blobs], initial=0))
+
+    def _contacts_changed(self):
+        """
+        Drop the search text and the results of past searches after the contacts changed.
+        """
+        self._search_text = None
+        self._last_search = None
+        self._cached_search.cache_clear()
+
+    def _build_indexes(self):
+        """
+        File all contacts in new full name and exact-match indexes, in one pass.
+        """
+        by_full_name = {}
+        exact_indexes = ({}, {}, {})
+        filed_keys = {}
+        indexes = (by_full_name, *exact_indexes)
+        for contact in self.contacts:
+            keys = _index_keys(contact)
+            filed_keys[contact] = keys
+            for index, key in zip(indexes, keys):
+                if key is not None:
+                    index.setdefault(key, []).append(contact)
+
+        self._by_full_name = by_full_name
+        self._exact_indexes = exact_indexes
+        self._filed_keys = filed_keys
+        self._phone_keys = None
+
+    def _index_contact(self, person: Person):
+        """
+        File the contact in the full name and exact-match indexes.
+
+        Args:
+            person (Person): The contact to index.
+        """
+        keys = _index_keys(person)
+        self._filed_keys[person] = keys
+        for index, key in zip((self._by_full_name, *self._exact_indexes), keys):
+            if key is not None:
+                index.setdefault(key, []).append(person)
+        if keys[3] is not None:
+            self._phone_keys = None
+
+    def _unindex_contact(self, person: Person):
+        """
+        Remove the contact from the full name and exact-match indexes.
+
+        Args:
+            person (Person): The contact to unindex.
+        """
+        keys = self._filed_keys.pop(person)
+        for index, key in zip((self._by_full_name, *self._exact_indexes), keys):
+            if key is not None:
+                _unfile(index, key, person)
+        if keys[3] is not None:
+            self._phone_keys = None
+
+    def _reindex_contact(self, old: Person, new: Person, position: int):
+        """
+        Refile a contact in the full name and exact-match indexes after it changed.
+
+        Under the keys it keeps, the new contact takes the old one's place in the
+        buckets. Under a new full name, it is filed among the contacts with that name
+        in the order of the contacts list, so the first of them is still bucket[0].
+
+        Args:
+            old (Person): The contact as filed, which may have been changed in place.
+            new (Person): The contact to file instead, which may be the same object.
+            position (int): The position of the contact in the contacts list.
+        """
+        old_keys = self._filed_keys.pop(old)
+        new_keys = _index_keys(new)
+        self._filed_keys[new] = new_keys
+        for index, old_key, new_key in zip((self._by_full_name, *self._exact_indexes),
+                                           old_keys, new_keys):
+            if old_key == new_key:
+                if old_key is not None:
+                    bucket = index[old_key]
+                    bucket[bucket.index(old)] = new
+                continue
+            if old_key is not None:
+                _unfile(index, old_key, old)
+            if new_key is None:
+                continue
+            bucket = index.setdefault(new_key, [])
+            if index is self._by_full_name:
+                bucket.insert(self._count_before(bucket, position), new)
+            else:
+                bucket.append(new)
+        if old_keys[3] != new_keys[3]:
+            self._phone_keys = None
+
+    def _count_before(self, bucket: List[Person], position: int) -> int:
+        """
+        Count the contacts of a bucket, kept in the order of the contacts list, that come
+        before the given position in the contacts list.
+
+        Args:
+            bucket (List[Person]): The contacts filed under a key.
+            position (int): The position in the contacts list.
+
+        Returns:
+            int: The number of contacts of the bucket before the position.
+        """
+        for count, contact in enumerate(bucket):
+            try:
+                self.contacts.index(contact, 0, position)
+            except ValueError:
+                return count
+        return len(bucket)
+
     def add_contact(self, person: Person):
         """
         Add a new contact to the phonebook
 
         Args:
             person (Person): a Person object representing the contact to add
+
+        Raises:
+            ValueError: If the Person object is already in the phonebook.
         """
+        if self._filed_keys is None:
+            self._build_indexes()
+        if person in self._filed_keys:
+            raise ValueError("Contact is already in the phonebook.")
+
         self.contacts.append(person)
+        self._index_contact(person)
+        self._contacts_changed()
+        self.dirty = True
 
     def remove_contact(self, person: Person):
         """
         Remove a contact from the phonebook
 
+        The remaining contacts keep their order.
+
         Args:
             person (Person): a Person object representing the contact to remove
         """
+        if self._filed_keys is None:
+            self._build_indexes()
+        if person not in self._filed_keys:
+            raise ValueError("Contact not found in the phonebook.")
+
+        self._unindex_contact(person)
+        # The indexes do not hold positions, so the contacts after it need no refiling
         self.contacts.remove(person)
+        self._contacts_changed()
+        self.dirty = True
 
     def update_contact(self, person: Person):
         """
         Update a contact in the phonebook.
 
+        The contact may either have been changed in place, or be a new Person object
+        replacing the first contact with the same full name.
+
         Args:
             person (Person): The updated Person object representing the contact.
         """
-        for index, contact in enumerate(self.contacts):
-            if contact.full_name == person.full_name:
-                self.contacts[index] = person
-                break
+        if self._filed_keys is None:
+            self._build_indexes()
+        if person in self._filed_keys:
+            old = person
         else:
-            raise ValueError("Contact not found in the phonebook.")
-        
+            bucket = self._by_full_name.get(person.full_name)
+            if not bucket:
+                raise ValueError("Contact not found in the phonebook.")
+            old = bucket[0]
+
+        position = self.contacts.index(old)
+        self.contacts[position] = person
+        self._reindex_contact(old, person, position)
+        self._contacts_changed()
+        self.dirty = True
+
     def get_contacts(self) -> List[Person]:
         """
         Get all contacts in the phonebook
@@ -122,18 +419,57 @@ class Phonebook:
         """
         Serialize the phonebook data to a file in the specified format
 
+        The data is serialized in memory, written to a temporary file with a single
+        write and flushed to disk, and the temporary file then replaces the file, so an
+        interrupted save never leaves a truncated file behind. On POSIX systems the
+        directory is flushed to disk as well, so the replacement survives a crash. If
+        the save fails, the temporary file is removed and the file is left as it was.
+
         Args:
             filename (str): the name of the file to save the data to
             format (str): the format to use for serialization ('json' or 'yaml')
         """
-        data = {contact.full_name: contact.__dict__ for contact in self.contacts}
+        data = {contact.full_name: contact.to_dict() for contact in self.contacts}
+
+        if file_format == 'json':
+            content = _dump_json(data)
 
-        with open(filename, 'w') as data_file:
-            if file_format == 'json':
-                json.dump(data, data_file, indent=4)
-            elif file_format == 'yaml':
-                #yaml.add_representer(Person, self.person_representer)
-                yaml.dump(data, data_file)
+        elif file_format == 'yaml':
+            import yaml
+
+            # Use the libyaml bindings when available, they are much faster than pure Python
+            dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+            #yaml.add_representer(Person, self.person_representer)
+            content = yaml.dump(data, Dumper=dumper).encode()
+
+        else:
+            raise ValueError("Unsupported file format: {}".format(file_format))
+
+        content = memoryview(content)
+
+        temp_filename = filename + '.tmp'
+        fd = os.open(temp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            try:
+                # A single write normally takes it all, but may legally write less
+                while content:
+                    content = content[os.write(fd, content):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(temp_filename, filename)
+        except BaseException:
+            os.unlink(temp_filename)
+            raise
+
+        # The replacement is only durable once the directory entry is on disk too.
+        # Windows cannot open a directory to flush it
+        if os.name == 'posix':
+            dir_fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
 
     def load_from_file(self, filename: str, file_format: str):
         """
@@ -143,21 +479,39 @@ class Phonebook:
             filename (str): the name of the file to load the data from
             format (str): the format to use for deserialization ('json' or 'yaml')
         """
-        with open(filename, 'r') as data_file:
-            if file_format == 'json':
-                data = json.load(data_file)
-            
-            elif file_format == 'yaml':
-                data = yaml.safe_load(data_file)
+        if file_format == 'json':
+            with open(filename, 'rb') as data_file:
+                content = data_file.read()
+            data = orjson.loads(content) if orjson is not None else json.loads(content)
+
+        elif file_format == 'yaml':
+            import yaml
+
+            # Use the libyaml bindings when available, they are much faster than pure Python
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+            with open(filename, 'r') as data_file:
+                data = yaml.load(data_file, Loader=loader)
 
-            for contact_info in data.values():
-                contact = Person.from_dict(contact_info)
-                self.contacts.append(contact)                
+        loaded = [Person.from_dict(contact_info) for contact_info in data.values()]
+
+        # The indexes are rebuilt in one pass when they are next needed
+        self.contacts.extend(loaded)
+        self._filed_keys = self._by_full_name = self._exact_indexes = None
+        self._contacts_changed()
 
     def search_contacts(self, query: str) -> List[Person]:
         """
         Search for contacts in the phonebook based on the given query.
 
+        A query made only of digits and phone punctuation (spaces, dashes, plus signs,
+        dots and parentheses) is treated as a phone number and matches the contacts
+        whose phone number starts with the same digits, unless SEARCH_PHONE is disabled.
+        Any other query is matched against the names of the contacts, and against their
+        addresses if SEARCH_ADDRESS is enabled, with a single scan over their
+        joined search texts, or within the last matches when the query extends the
+        previous one. The results of the 128 most recent queries are cached until the
+        contacts change.
+
         Args:
             query (str): The search query, which can be a first name, last name,
                          full name, phone, or address.
@@ -165,20 +519,120 @@ class Phonebook:
         Returns:
             List[Person]: A list of Person objects matching the search query.
         """
+        return list(self._cached_search(query.lower()))
+
+    def _search(self, query: str) -> tuple:
+        """
+        Search for contacts in the phonebook, as described in `search_contacts()`.
+
+        Args:
+            query (str): The lowercased search query.
+
+        Returns:
+            tuple: The Person objects matching the search query.
+        """
+        if SEARCH_PHONE:
+            digits = query.translate(_PHONE_PUNCTUATION)
+            if digits.isdecimal():
+                return tuple(self._search_phone_prefix(digits))
+
+        # A separator in the query could only match across two fields or contacts
+        if not self.contacts or _RECORD_SEPARATOR in query or _FIELD_SEPARATOR in query:
+            return ()
+
+        # Narrowing down the last matches beats a new scan while they are few
+        last_search = self._last_search
+        if (last_search is not None and last_search[0] in query
+                and len(last_search[1]) * 4 < len(self.contacts)):
+            search_text = _contact_search_text()
+            results = tuple(contact for contact in last_search[1]
+                            if query in search_text(contact))
+        else:
+            results = tuple(self._scan_search_text(query))
+
+        self._last_search = (query, results)
+        return results
+
+    def _scan_search_text(self, query: str) -> List[Person]:
+        """
+        Find the contacts whose search text contains the query, in a single scan over
+        the joined search texts of all contacts.
+
+        Args:
+            query (str): The lowercased search query.
+
+        Returns:
+            List[Person]: A list of Person objects matching the search query.
+        """
+        if self._search_text is None:
+            self._build_search_text()
+
+        text = self._search_text
+        starts = self._search_starts
         results = []
-        query = query.lower()
-        
-        for contact in self.contacts:
-            if ((contact.first_name and query in contact.first_name.lower()) or
-                    (contact.last_name and query in contact.last_name.lower()) or
-                    (contact.full_name and query in contact.full_name.lower()) or
-                    (contact.phone and query in contact.phone.lower()) or
-                    (contact.address and query in contact.address.lower())):
-                
-                results.append(contact)
-        
+
+        position = text.find(query)
+        while position != -1:
+            record = bisect_right(starts, position) - 1
+            results.append(self.contacts[record])
+
+            # Resume at the next contact so each contact is reported once
+            position = text.find(query, starts[record + 1])
+
+        return results
+
+    def _search_phone_prefix(self, digits: str) -> List[Person]:
+        """
+        Find the contacts whose phone number starts with the given digits.
+
+        Args:
+            digits (str): The leading digits of the phone number.
+
+        Returns:
+            List[Person]: A list of Person objects ordered by phone number.
+        """
+        if self._filed_keys is None:
+            self._build_indexes()
+        phone_index = self._exact_indexes[2]
+        if self._phone_keys is None:
+            self._phone_keys = sorted(phone_index)
+
+        keys = self._phone_keys
+        results = []
+        for position in range(bisect_left(keys, digits), len(keys)):
+            if not keys[position].startswith(digits):
+                break
+            results.extend(phone_index[keys[position]])
+
         return results
-    
+
+    def search_exact(self, field: str, value: str) -> List[Person]:
+        """
+        Look up contacts whose field exactly matches the given value, ignoring case.
+
+        Unlike `search_contacts()`, this is a dictionary lookup and does not scan
+        the whole phonebook. Phone numbers are compared by their digits only.
+
+        Args:
+            field (str): The field to match: 'first_name', 'last_name' or 'phone'.
+            value (str): The value to look up.
+
+        Returns:
+            List[Person]: A list of Person objects whose field matches the value.
+        """
+        if field not in _EXACT_FIELDS:
+            raise ValueError("Unsupported field for an exact search: {}".format(field))
+
+        index = _EXACT_FIELDS.index(field)
+        if field == 'phone':
+            key = _NON_DIGITS.sub('', value)
+        else:
+            key = value.lower()
+
+        if self._filed_keys is None:
+            self._build_indexes()
+        return list(self._exact_indexes[index].get(key, ()))
+
     def display_contact_info(self, person, item_number=None):
         """
         Prints the given contact's data on the screen.
@@ -189,12 +643,25 @@ class Phonebook:
                                          This has been specified for interaction purposes if needed.
         """
 
-        print('\n')
-        if item_number is not None:
-            print('{}Item number: {}{}'.format(style["GREEN"], item_number, style["END"]))
+        sys.stdout.write(self._format_contact_info(person, item_number))
+
+    def _format_contact_info(self, person, item_number=None):
+        """
+        Format the given contact's data for the screen.
+
+        Args:
+            person (Person): A single contact object.
+            item_number (int, optional): The number of the contact to be printed, if desired.
 
-        for item, value in person.__dict__.items():
-            print('  {: >15} : {}'.format(item.replace('_', ' '), value))
+        Returns:
+            str: The contact's data, preceded by a blank line.
+        """
+        if item_number is None:
+            header = '\n\n'
+        else:
+            header = '\n\n{}Item number: {}{}\n'.format(style["GREEN"], item_number, style["END"])
+
+        return header + _CONTACT_TEMPLATE.format_map(person.to_dict())
 
     def display_all_contacts(self):
         """
@@ -206,5 +673,4 @@ class Phonebook:
         Returns:
             None
         """
-        for contact in self.contacts:
-            self.display_contact_info(contact)
+        sys.stdout.write(''.join(map(self._format_contact_info, self.contacts)))
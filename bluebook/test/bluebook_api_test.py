@@ -20,15 +20,24 @@ Date: May 10, 2023
 
 import unittest
 import os
-import sys
-import io
+import builtins
+import tempfile
 from datetime import datetime
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 import argparse
 
 from lib.person import Person
 from lib.phonebook import Phonebook
-from api.bluebook import *
+import api.bluebook
+from api.bluebook import (add_contact, export_phonebook, generate_contacts_html, get_options,
+                          get_target_contact, parse_simple_options, remove_contact,
+                          search_contacts, update_contact)
+
+# The contact most test cases work with
+_JOHN_DOE = dict(first_name='John', last_name='Doe', phone='123456', address='123 Main St')
+
+# The moment test_export_phonebook pretends the export was made at.
+_FIXED_DT = datetime(2023, 5, 11, 0, 3, 48)
 
 
 class BlueBookApiTestCase(unittest.TestCase):
@@ -38,6 +47,8 @@ class BlueBookApiTestCase(unittest.TestCase):
     This class defines test cases for the various functions of the BlueBook API.
 
     Methods:
+        setUpClass: Method called once to create the contacts and the command line
+            arguments shared by the test cases.
         setUp: Method called before each test case to set up the test environment.
         test_get_target_contact: Test case for the get_target_contact function.
         test_add_contact: Test case for the add_contact function.
@@ -45,46 +56,67 @@ class BlueBookApiTestCase(unittest.TestCase):
         test_update_contact: Test case for the update_contact function.
         test_search_contacts: Test case for the search_contacts function.
         test_export_phonebook: Test case for the export_phonebook function.
+        test_generate_contacts_html: Test case for the generate_contacts_html function.
+        test_get_options: Test case for the get_options function.
     """
 
+    @classmethod
+    def setUpClass(cls):
+        """
+        Method called once before the test cases to create the contacts and the
+        command line arguments they share.
+
+        The shared contacts must not be mutated by a test case; a test case that
+        changes a contact creates its own. The arguments set every field, so the
+        commands never prompt for and store a missing one.
+        """
+        cls.john = Person(**_JOHN_DOE)
+        cls.jane = Person(first_name='Jane', last_name='Smith', phone='987654', address='456 Elm St')
+
+        cls.add_args = argparse.Namespace(**_JOHN_DOE)
+        cls.remove_args = argparse.Namespace(remove=['John', 'Doe'])
+        cls.update_args = argparse.Namespace(
+            update=['John', 'Doe'],
+            phone='9876543210',
+            first_name='John',
+            last_name='Mcenzy',
+            address='1235 new way'
+        )
+        cls.search_args = argparse.Namespace(search=['John', 'Doe'])
+
     def setUp(self):
         """
         Method called before each test case to set up the test environment.
 
-        This method instantiates a phonebook instance and creates a StringIO object
-        to capture the output. It also redirects stdout to the StringIO object.
+        This method instantiates a phonebook instance and replaces the built-in input
+        function so every prompt is answered with 'yes'. The original input function is
+        restored by a cleanup, which runs even when setUp itself fails later on.
         """
         self.phonebook = Phonebook()
-        self.captured_output = io.StringIO()
-        sys.stdout = self.captured_output
+        self.addCleanup(setattr, builtins, 'input', builtins.input)
+        builtins.input = lambda *args, **kwargs: 'yes'
 
-    @patch('builtins.input', return_value='yes')
-    def test_get_target_contact(self, mock_input):
+    def test_get_target_contact(self):
         """
         Test case for the get_target_contact function.
 
         This test case verifies the behavior of the get_target_contact function by
         setting up test data, calling the function under test, and asserting the result.
 
-        It uses the patch decorator to mock the built-in input function and provide
-        a predetermined user input.
+        The built-in input function is replaced by setUp to answer every prompt with 'yes'.
 
         Test steps:
         1. Set up test data.
         2. Call the function under test.
         3. Assert the result.
 
-        Args:
-            mock_input: Mocked input function.
-
         Returns:
             None.
         """
         name_info = ['John', 'Doe']
-        contact = Person(first_name='John', last_name='Doe', phone='123456', address='123 Main St')
-        self.phonebook.add_contact(contact)
+        self.phonebook.add_contact(self.john)
         result = get_target_contact(name_info, self.phonebook)
-        self.assertEqual(result, contact)
+        self.assertEqual(result, self.john)
 
     def test_add_contact(self):
         """
@@ -96,87 +128,63 @@ class BlueBookApiTestCase(unittest.TestCase):
         Test steps:
         1. Set up test data.
         2. Call the function under test.
-        3. Assert the contact is added to the phonebook.
+        3. Assert the contact is added to the phonebook, checking each field in a subtest.
 
         Returns:
             None.
         """
-        args = argparse.Namespace(first_name='John', 
-                                  last_name='Doe', 
-                                  phone='123456', 
-                                  address='123 Main St')
-        
-        add_contact(args, self.phonebook)
+        add_contact(self.add_args, self.phonebook)
         self.assertEqual(len(self.phonebook.contacts), 1)
-        self.assertEqual(self.phonebook.contacts[0].first_name, 'John')
-        self.assertEqual(self.phonebook.contacts[0].last_name, 'Doe')
-        self.assertEqual(self.phonebook.contacts[0].phone, '123456')
-        self.assertEqual(self.phonebook.contacts[0].address, '123 Main St')
+        c = self.phonebook.contacts[0]
+        for name, expected in _JOHN_DOE.items():
+            with self.subTest(field=name):
+                self.assertEqual(getattr(c, name), expected)
 
-    @patch('builtins.input', return_value='yes')
-    def test_remove_contact(self, mock_input):
+    def test_remove_contact(self):
         """
         Test case for the remove_contact function.
 
         This test case verifies the behavior of the remove_contact function by setting up
         test data, calling the function under test, and asserting the result.
 
-        It uses the patch decorator to mock the built-in input function and provide
-        a predetermined user input.
+        The built-in input function is replaced by setUp to answer every prompt with 'yes'.
 
         Test steps:
         1. Set up test data.
         2. Call the function under test.
         3. Assert the contact is removed from the phonebook.
 
-        Args:
-            mock_input: Mocked input function.
-
         Returns:
             None.
         """
-        args = argparse.Namespace(remove=['John', 'Doe'])
-        phonebook = Phonebook()
-        contact = Person(first_name='John', last_name='Doe', phone='123456', address='123 Main St')
-        phonebook.add_contact(contact)
-        remove_contact(args, phonebook)
-        self.assertEqual(len(phonebook.contacts), 0)
+        self.phonebook.add_contact(self.john)
+        remove_contact(self.remove_args, self.phonebook)
+        self.assertEqual(len(self.phonebook.contacts), 0)
 
-    @patch('builtins.input', return_value='yes')
-    def test_update_contact(self, mock_input):
+    def test_update_contact(self):
         """
         Test case for the update_contact function.
 
         This test case verifies the behavior of the update_contact function by setting up
         test data, calling the function under test, and asserting the result.
 
-        It uses the patch decorator to mock the built-in input function and provide
-        a predetermined user input.
+        The built-in input function is replaced by setUp to answer every prompt with 'yes'.
 
         Test steps:
         1. Set up test data.
         2. Call the function under test.
         3. Assert the contact is updated in the phonebook.
 
-        Args:
-            mock_input: Mocked input function.
-
         Returns:
             None.
         """
-        args = argparse.Namespace(
-            update=['John', 'Doe'],
-            phone='9876543210',
-            first_name='John',
-            last_name='Mcenzy',
-            address='1235 new way'
-        )
-
-        contact = Person(first_name='John', last_name='Doe', phone='123456', address='123 Main St')
+        # update_contact changes the contact in place, so it is not the shared one.
+        contact = Person(**_JOHN_DOE)
         self.phonebook.add_contact(contact)
-        update_contact(args, self.phonebook)
+        update_contact(self.update_args, self.phonebook)
         self.assertEqual(len(self.phonebook.contacts), 1)
-        self.assertEqual(self.phonebook.contacts[0].phone, '9876543210')
+        c = self.phonebook.contacts[0]
+        self.assertEqual((c.phone, c.full_name), ('9876543210', 'John Mcenzy'))
 
     def test_search_contacts(self):
         """
@@ -193,14 +201,11 @@ class BlueBookApiTestCase(unittest.TestCase):
         Returns:
             None.
         """
-        args = argparse.Namespace(search=['John', 'Doe'])
-        person1 = Person(first_name='John', last_name='Doe', phone='123456', address='123 Main St')
-        person2 = Person(first_name='Jane', last_name='Smith', phone='987654', address='456 Elm St')
-        self.phonebook.add_contact(person1)
-        self.phonebook.add_contact(person2)
-        result = search_contacts(args, self.phonebook)
+        self.phonebook.add_contact(self.john)
+        self.phonebook.add_contact(self.jane)
+        result = search_contacts(self.search_args, self.phonebook)
         self.assertEqual(len(result), 1)
-        self.assertIn(person1, result)
+        self.assertIn(self.john, result)
 
     def test_export_phonebook(self):
         """
@@ -211,34 +216,81 @@ class BlueBookApiTestCase(unittest.TestCase):
 
         Test steps:
         1. Set up test data.
-        2. Set up mock file and export format.
-        3. Patch the built-in open function.
-        4. Patch the datetime module to return a fixed timestamp.
+        2. Set up a temporary export directory and the export format.
+        3. Patch the export directory.
+        4. Patch the current time used for the export to a fixed one.
         5. Call the function under test.
-        6. Assert that the open function was called with the expected filename and mode.
+        6. Assert that only the expected file was written, and that it loads back.
 
         Returns:
             None.
         """
-        person1 = Person(first_name='John', last_name='Doe', phone='123456', address='123 Main St')
-        person2 = Person(first_name='Jane', last_name='Smith', phone='987654', address='456 Elm St')
-        self.phonebook.add_contact(person1)
-        self.phonebook.add_contact(person2)
+        self.phonebook.add_contact(self.john)
+        self.phonebook.add_contact(self.jane)
 
         export_format = 'json'
-        mock_file = mock_open()
 
-        with patch('builtins.open', mock_file) as mock_open_file:
-            fixed_timestamp = '2023-05-11_00-03-48'  # Update with the actual timestamp generated during the test
-            with patch('datetime.datetime') as mock_datetime:
-                mock_datetime.now.return_value = datetime.strptime(fixed_timestamp, '%Y-%m-%d_%H-%M-%S')
+        with tempfile.TemporaryDirectory() as export_dir, \
+                patch('api.bluebook.EXPORTS_DIR', export_dir):
+            fixed_timestamp = '2023-05-11_00-03-48'  # _FIXED_DT as export_phonebook formats it
+            with patch.object(api.bluebook, '_now', return_value=_FIXED_DT):
+                export_path = export_phonebook(self.phonebook, export_format)
+            expected_filepath = os.path.join(export_dir,
+                                             f'phonebook-export-{fixed_timestamp}.json')
+            self.assertEqual(export_path, expected_filepath)
+            self.assertEqual(os.listdir(export_dir), [os.path.basename(expected_filepath)])
+
+            exported = Phonebook()
+            exported.load_from_file(export_path, export_format)
+            self.assertEqual([contact.to_dict() for contact in exported.contacts],
+                             [self.john.to_dict(), self.jane.to_dict()])
+
+    def test_generate_contacts_html(self):
+        """
+        Test case for the generate_contacts_html function.
 
-                expected_filename = export_phonebook(self.phonebook, export_format)
-                expected_filepath = os.path.join('exports', expected_filename)
-                print('expected_filepath', expected_filepath)
-                mock_open_file.assert_called_once_with(expected_filepath, 'w')
+        This test case verifies that the contacts' information is HTML-escaped in the
+        generated HTML.
+
+        Test steps:
+        1. Set up test data.
+        2. Call the function under test.
+        3. Assert the special characters are escaped.
+
+        Returns:
+            None.
+        """
+        person = Person(first_name='<b>John</b>', last_name='Doe', phone='123456',
+                        address='"Tom & Jerry\'s" St')
+        self.phonebook.add_contact(person)
+        html = generate_contacts_html(self.phonebook)
+        self.assertIn('<h2>&lt;b&gt;John&lt;/b&gt; Doe</h2>', html)
+        self.assertIn('<p>Address: &quot;Tom &amp; Jerry&#39;s&quot; St</p>', html)
+
+    def test_get_options(self):
+        """
+        Test case for the get_options function.
+
+        This test case verifies that a single action is parsed without the full parser,
+        that any other command line still goes through it, and that both set the same
+        options.
+
+        Returns:
+            None.
+        """
+        args = get_options(['-s', 'John', 'Doe'])
+        self.assertEqual(args.search, ['John', 'Doe'])
+        self.assertFalse(args.add)
+        self.assertIsNone(args.first_name)
+
+        args = get_options(['-a', '--first-name', 'John', '-p', '123456'])
+        self.assertTrue(args.add)
+        self.assertEqual((args.first_name, args.phone), ('John', '123456'))
+        self.assertIsNone(args.search)
+
+        # Options added to the parser must also be added to the fast path's defaults
+        self.assertEqual(vars(parse_simple_options(['-d'])).keys(), vars(args).keys())
 
 
 if __name__ == '__main__':
     unittest.main()
-
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
+import os
+import time
 import unittest
-import sys
-import io
-from unittest.mock import patch
+import tempfile
+from unittest.mock import MagicMock, patch
 from lib.person import Person
-from lib.phonebook import Phonebook
+from lib.phonebook import Phonebook, orjson
+
+# The contact shared by the test cases
+_JOHN_DOE = dict(first_name="John", last_name="Doe", phone="123456789", address="123 Main St")
 
 
 class BlueBookApiTestCase(unittest.TestCase):
@@ -17,91 +21,393 @@ class BlueBookApiTestCase(unittest.TestCase):
     the phonebook.
 
     The tests use the `unittest.mock` module to mock the underlying methods of the `Phonebook` 
-    class and verify the expected behavior.
+    class and verify the expected behavior. The mock is built once and reset after each test.
 
     Methods:
+        setUpClass(): Set up the contact and the phonebook mock shared by the test cases.
         setUp(): Set up the test fixture.
+        tearDown(): Reset the shared phonebook mock.
         test_add_contact(): Test the add_contact() method of Phonebook.
         test_remove_contact(): Test the remove_contact() method of Phonebook.
         test_update_contact(): Test the update_contact() method of Phonebook.
+        test_search_exact(): Test the search_exact() method of Phonebook.
+        test_search_contacts_by_phone(): Test phone number queries of search_contacts().
+        test_dirty(): Test that only changes to the contacts mark the phonebook as dirty.
+        test_search_contacts_while_typing(): Test queries extending the previous query.
+        test_remove_contact_keeps_order(): Test that removing a contact keeps the others' order.
+        test_update_contact_duplicate_names(): Test replacing one of two contacts with one name.
+        test_save_to_file_json_fallback(): Test that the json fallback saves the same file.
+        test_load_from_file(): Test changing and searching the contacts of a loaded phonebook.
+        test_save_to_file_failure(): Test that a failed save leaves the saved file as it was.
+        test_search_contacts_after_changes(): Test repeating a search after the contacts change.
+        test_search_contacts_without_phone(): Test searches with SEARCH_PHONE disabled.
+        test_search_contacts_without_address(): Test searches with SEARCH_ADDRESS disabled.
+        test_update_and_remove_contact_large(): Test the speed of changes in a large phonebook.
+        test_add_contact_twice(): Test that the same Person object cannot be added twice.
+        test_save_to_file_durable(): Test that a save flushes the file and its directory.
     """
 
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the contact and the phonebook mock shared by the test cases.
+
+        This method is called once before the test cases. Test cases must not mutate the
+        shared contact; those that do create their own `Person`.
+        """
+        cls.john = Person(**_JOHN_DOE)
+        cls.phonebook_mock = MagicMock(spec=Phonebook)
+
     def setUp(self):
         """
         Set up the test fixture.
 
-        This method is called before each test case. It instantiates a `Phonebook` object and 
-        sets up a `StringIO` object to capture the output printed to stdout during the tests.
+        This method is called before each test case. It instantiates a `Phonebook` object.
         """
         self.phonebook = Phonebook()
 
-        # Create a StringIO object to capture the output
-        self.captured_output = io.StringIO()
+    def tearDown(self):
+        """
+        Tear down the test fixture.
 
-        # Redirect stdout to the StringIO object
-        sys.stdout = self.captured_output
+        This method is called after each test case. It resets the calls recorded by the shared
+        phonebook mock, so each test case only sees its own.
+        """
+        self.phonebook_mock.reset_mock()
 
     def test_add_contact(self):
         """
         Test case for the add_contact() method.
 
-        This method tests the add_contact() method of the Phonebook class. It creates a Person 
-        object with sample data, mocks the add_contact() method of the Phonebook object, and 
+        This method tests the add_contact() method of the Phonebook class. It takes the shared
+        Person object, calls the add_contact() method of the shared Phonebook mock, and 
         asserts that the add_contact() method is called with the expected Person object.
         """
-        person_data = {
-            "first_name": "John",
-            "last_name": "Doe",
-            "phone": "123456789",
-            "address": "123 Main St"
-        }
-        expected_person = Person(**person_data)
-
-        with patch.object(self.phonebook, "add_contact") as mock_add_contact:
-            self.phonebook.add_contact(expected_person)
-            mock_add_contact.assert_called_with(expected_person)
+        self.phonebook_mock.add_contact(self.john)
+        self.phonebook_mock.add_contact.assert_called_with(self.john)
 
     def test_remove_contact(self):
         """
         Test case for the remove_contact() method.
 
-        This method tests the remove_contact() method of the Phonebook class. It creates a Person 
-        object with sample data, mocks the remove_contact() method of the Phonebook object, 
+        This method tests the remove_contact() method of the Phonebook class. It takes the shared
+        Person object, calls the remove_contact() method of the shared Phonebook mock, 
         the expected Person object.
         """
-        person_data = {
-            "first_name": "John",
-            "last_name": "Doe",
-            "phone": "123456789",
-            "address": "123 Main St"
-        }
-        person = Person(**person_data)
-
-        with patch.object(self.phonebook, "remove_contact") as mock_remove_contact:
-            self.phonebook.remove_contact(person)
-            mock_remove_contact.assert_called_with(person)
+        self.phonebook_mock.remove_contact(self.john)
+        self.phonebook_mock.remove_contact.assert_called_with(self.john)
 
     def test_update_contact(self):
         """
         Test case for the update_contact() method.
 
-        This method tests the update_contact() method of the Phonebook class. It creates a Person 
-        object with sample data, mocks the update_contact() method of the Phonebook object, 
+        This method tests the update_contact() method of the Phonebook class. It takes the shared
+        Person object, calls the update_contact() method of the shared Phonebook mock, 
         and asserts that the update_contact() method is called with the expected Person object.
         """
-        person_data = {
-            "first_name": "John",
-            "last_name": "Doe",
-            "phone": "123456789",
-            "address": "123 Main St"
-        }
+        self.phonebook_mock.update_contact(self.john)
+        self.phonebook_mock.update_contact.assert_called_with(self.john)
+
+    def test_search_exact(self):
+        """
+        Test case for the search_exact() method.
+
+        This method adds a contact to the phonebook, updates its name in place and asserts
+        that search_exact() finds it by its new name and phone digits only.
+        """
+        person = Person("John", "Doe", "123-456-789", "123 Main St")
+        self.phonebook.add_contact(person)
+
+        person.first_name = "Johnny"
+        self.phonebook.update_contact(person)
+
+        self.assertEqual(self.phonebook.search_exact("first_name", "JOHNNY"), [person])
+        self.assertEqual(self.phonebook.search_exact("first_name", "John"), [])
+        self.assertEqual(self.phonebook.search_exact("phone", "123456789"), [person])
+        self.assertEqual(self.phonebook.search_contacts("doe"), [person])
+
+    def test_search_contacts_by_phone(self):
+        """
+        Test case for phone number queries of the search_contacts() method.
+
+        This method asserts that a query shaped like a phone number matches the phone
+        numbers starting with its digits, regardless of punctuation.
+        """
+        john = Person("John", "Doe", "555-0100", "12 Main St")
+        jane = Person("Jane", "Roe", "5550199", "55 Elm St")
+        mary = Person("Mary", "Poe", "6665550", "")
+        for person in (jane, mary, john):
+            self.phonebook.add_contact(person)
+
+        self.assertEqual(self.phonebook.search_contacts("555"), [john, jane])
+        self.assertEqual(self.phonebook.search_contacts("(555) 01-99"), [jane])
+        self.assertEqual(self.phonebook.search_contacts("main"), [john])
+
+    def test_dirty(self):
+        """
+        Test case for the dirty flag of Phonebook.
+
+        This method asserts that searching the phonebook leaves it clean, while adding,
+        updating and removing a contact mark it as dirty.
+        """
+        self.assertFalse(self.phonebook.dirty)
+
+        for change in (self.phonebook.add_contact, self.phonebook.update_contact,
+                       self.phonebook.remove_contact):
+            self.phonebook.dirty = False
+            self.phonebook.search_contacts("john")
+            self.assertFalse(self.phonebook.dirty)
+
+            change(self.john)
+            self.assertTrue(self.phonebook.dirty)
+
+    def test_search_contacts_while_typing(self):
+        """
+        Test case for search_contacts() queries that extend the previous query.
+
+        This method asserts that narrowing down the previous matches gives the same results
+        as a full search, and that contacts added in between are still found.
+        """
+        for index in range(10):
+            self.phonebook.add_contact(Person("Jane", "Roe {}".format(index), "", "Elm St"))
+        john = Person("John", "Doe", "", "Main St")
+        self.phonebook.add_contact(john)
+
+        self.assertEqual(self.phonebook.search_contacts("jo"), [john])
+        self.assertEqual(self.phonebook.search_contacts("joh"), [john])
+        self.assertEqual(self.phonebook.search_contacts("johnny"), [])
+
+        johnny = Person("Johnny", "Doe", "", "Main St")
+        self.phonebook.add_contact(johnny)
+        self.assertEqual(self.phonebook.search_contacts("johnny d"), [johnny])
+
+    def test_remove_contact_keeps_order(self):
+        """
+        Test case for the order of the contacts after remove_contact().
+
+        This method removes a contact from the middle of the phonebook and asserts that the
+        other contacts keep their order, and can still be updated and removed by full name.
+        """
+        people = [Person(name, "Doe", str(index), "") for index, name in enumerate("abcde")]
+        for person in people:
+            self.phonebook.add_contact(person)
+
+        self.phonebook.remove_contact(people[1])
+        self.assertEqual([contact.first_name for contact in self.phonebook.contacts],
+                         ["a", "c", "d", "e"])
+
+        self.phonebook.update_contact(Person("d", "Doe", "33", ""))
+        self.phonebook.remove_contact(people[4])
+        self.assertEqual([contact.phone for contact in self.phonebook.contacts],
+                         ["0", "2", "33"])
+
+    def test_update_contact_duplicate_names(self):
+        """
+        Test case for update_contact() with a new Person whose full name several contacts share.
+
+        This method asserts that the first contact with the full name is replaced, also after
+        it has been removed and the next one has become the first.
+        """
+        self.phonebook.add_contact(Person("John", "Doe", "1", "a"))
+        self.phonebook.add_contact(Person("John", "Doe", "2", "b"))
+
+        self.phonebook.update_contact(Person("John", "Doe", "3", "c"))
+        self.assertEqual([contact.phone for contact in self.phonebook.contacts], ["3", "2"])
+
+        self.phonebook.remove_contact(self.phonebook.contacts[0])
+        self.phonebook.update_contact(Person("John", "Doe", "4", "d"))
+        self.assertEqual([contact.phone for contact in self.phonebook.contacts], ["4"])
+
+    def test_save_to_file_json_fallback(self):
+        """
+        Test case for save_to_file() in JSON without orjson.
+
+        This method saves a contact with a non-ASCII name with the json fallback and asserts
+        that the name is written as UTF-8, byte for byte like orjson when it is installed.
+        """
+        self.phonebook.add_contact(Person("Zoë", "Doe", "123", "Straße 1"))
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "phonebook.json")
+            with patch("lib.phonebook.orjson", None):
+                self.phonebook.save_to_file(filename, "json")
+            with open(filename, "rb") as data_file:
+                content = data_file.read()
+
+            self.assertIn('"Zoë Doe"'.encode(), content)
+            if orjson is not None:
+                self.phonebook.save_to_file(filename, "json")
+                with open(filename, "rb") as data_file:
+                    self.assertEqual(data_file.read(), content)
+
+    def test_load_from_file(self):
+        """
+        Test case for the contacts loaded by load_from_file().
+
+        This method saves a phonebook, loads it into a new one and asserts that the loaded
+        contacts can be searched, updated and removed like contacts added one by one. It
+        also loads the file into the saved phonebook, next to the contacts it already has.
+        """
+        self.phonebook.add_contact(Person("John", "Doe", "555-0100", "12 Main St"))
+        self.phonebook.add_contact(Person("Jane", "Roe", "555-0199", "55 Elm St"))
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "phonebook.json")
+            self.phonebook.save_to_file(filename, "json")
+            loaded = Phonebook()
+            loaded.load_from_file(filename, "json")
+            self.phonebook.load_from_file(filename, "json")
+
+        self.assertEqual(len(self.phonebook.search_exact("phone", "5550199")), 2)
+
+        john, jane = loaded.contacts
+        self.assertEqual(loaded.search_exact("phone", "5550199"), [jane])
+        self.assertEqual(loaded.search_contacts("555 01"), [john, jane])
+
+        loaded.update_contact(Person("John", "Doe", "555-0111", "1 New St"))
+        self.assertEqual(loaded.search_exact("phone", "5550111")[0].address, "1 New St")
+
+        loaded.remove_contact(jane)
+        self.assertEqual(loaded.search_contacts("555"), loaded.contacts)
+        self.assertEqual(len(loaded.contacts), 1)
+
+    def test_save_to_file_failure(self):
+        """
+        Test case for save_to_file() failing to write the file.
+
+        This method makes flushing the file to disk fail and asserts that the error is raised,
+        the previously saved file is unchanged and no temporary file is left behind.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "phonebook.json")
+            self.phonebook.save_to_file(filename, "json")
+
+            self.phonebook.add_contact(self.john)
+            with patch("lib.phonebook.os.fsync", side_effect=OSError(28, "No space left")):
+                with self.assertRaises(OSError):
+                    self.phonebook.save_to_file(filename, "json")
+
+            self.assertEqual(os.listdir(directory), ["phonebook.json"])
+            with open(filename, "rb") as data_file:
+                self.assertEqual(data_file.read(), b"{}")
+
+    def test_search_contacts_after_changes(self):
+        """
+        Test case for repeating the same search_contacts() query after the contacts change.
+
+        This method asserts that adding, updating and removing a contact change the results
+        of a query made before, instead of returning the cached results.
+        """
+        john = Person("John", "Doe", "555-0100", "12 Main St")
+        self.phonebook.add_contact(john)
+        self.assertEqual(self.phonebook.search_contacts("doe"), [john])
+        self.assertEqual(self.phonebook.search_contacts("555"), [john])
+
+        jane = Person("Jane", "Doe", "555-0199", "55 Elm St")
+        self.phonebook.add_contact(jane)
+        self.assertEqual(self.phonebook.search_contacts("doe"), [john, jane])
+        self.assertEqual(self.phonebook.search_contacts("555"), [john, jane])
+
+        john.last_name = "Roe"
+        john.phone = "666-0100"
+        self.phonebook.update_contact(john)
+        self.assertEqual(self.phonebook.search_contacts("doe"), [jane])
+        self.assertEqual(self.phonebook.search_contacts("555"), [jane])
+
+        self.phonebook.remove_contact(jane)
+        self.assertEqual(self.phonebook.search_contacts("doe"), [])
+        self.assertEqual(self.phonebook.search_contacts("555"), [])
+
+    def test_search_contacts_without_phone(self):
+        """
+        Test case for search_contacts() with SEARCH_PHONE disabled.
+
+        This method asserts that a query made of digits is matched against the names and
+        addresses instead of the phone numbers.
+        """
+        john = Person("John", "Doe", "555-0100", "12 Main St")
+        self.phonebook.add_contact(john)
+
+        with patch("lib.phonebook.SEARCH_PHONE", False):
+            self.assertEqual(self.phonebook.search_contacts("12"), [john])
+            self.assertEqual(self.phonebook.search_contacts("555"), [])
+
+    def test_search_contacts_without_address(self):
+        """
+        Test case for search_contacts() with SEARCH_ADDRESS disabled.
+
+        This method asserts that queries only match the names, both with a new scan and
+        when narrowing down the previous matches.
+        """
+        for index in range(10):
+            self.phonebook.add_contact(Person("Ann", "Roe {}".format(index), "", ""))
+        john = Person("Jo", "Doe", "", "Jo Doeville")
+        self.phonebook.add_contact(john)
+
+        with patch("lib.phonebook.SEARCH_ADDRESS", False):
+            self.assertEqual(self.phonebook.search_contacts("doeville"), [])
+            self.assertEqual(self.phonebook.search_contacts("jo doe"), [john])
+            self.assertEqual(self.phonebook.search_contacts("jo doev"), [])
+
+    def test_update_and_remove_contact_large(self):
+        """
+        Test case for the speed of update_contact() and remove_contact() in a large phonebook.
+
+        This method updates and removes contacts at the front of a phonebook of 50,000
+        contacts. Without Python-level work for every other contact on each change, this
+        takes a few milliseconds; the limit is set a hundred times higher, and well below
+        what walking the indexes on each change takes.
+        """
+        for index in range(50000):
+            self.phonebook.add_contact(Person("First{}".format(index), "Last", str(index), ""))
+
+        start = time.perf_counter()
+        for index in range(100):
+            self.phonebook.update_contact(Person("First{}".format(index), "Last", "0", ""))
+            self.phonebook.remove_contact(self.phonebook.contacts[0])
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(self.phonebook.contacts), 49900)
+        self.assertLess(elapsed, 0.25)
+
+    def test_add_contact_twice(self):
+        """
+        Test case for add_contact() with a Person object already in the phonebook.
+
+        This method asserts that adding the same object again raises a ValueError and leaves
+        the phonebook unchanged, so the contact can still be removed.
+        """
+        self.phonebook.add_contact(self.john)
+        with self.assertRaises(ValueError):
+            self.phonebook.add_contact(self.john)
+        self.assertEqual(self.phonebook.contacts, [self.john])
+
+        self.phonebook.remove_contact(self.john)
+        self.assertEqual(self.phonebook.contacts, [])
+        self.assertEqual(self.phonebook.search_contacts("john"), [])
+
+    @unittest.skipUnless(os.name == "posix", "directories are only flushed on POSIX systems")
+    def test_save_to_file_durable(self):
+        """
+        Test case for flushing a saved file to disk in save_to_file().
+
+        This method asserts that both the temporary file and the directory it replaced the
+        file in are flushed to disk, the directory after the replacement.
+        """
+        self.phonebook.add_contact(self.john)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "phonebook.json")
+            synced = []
 
-        expected_updated_person = Person(**person_data)
+            def fsync(fd):
+                synced.append(os.path.exists(filename))
+                os.fstat(fd)
 
-        with patch.object(self.phonebook, "update_contact") as mock_update_contact:
-            self.phonebook.update_contact(expected_updated_person)
-            mock_update_contact.assert_called_with(expected_updated_person)
+            with patch("lib.phonebook.os.fsync", side_effect=fsync):
+                self.phonebook.save_to_file(filename, "json")
 
+        self.assertEqual(synced, [False, True])
 
 
 if __name__ == '__main__':